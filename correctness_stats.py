@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+def permutation_test(a: np.ndarray, b: np.ndarray, n_resamples: int = 10000, rng: np.random.Generator = None) -> np.ndarray:
+    """Two-sided permutation test for the difference of means between two groups, for many metrics at once.
+
+    All the permutations are computed in a single array operation: a (n_resamples, n) matrix of permuted
+    indices is used to index the (n, metrics) values.
+
+    Args:
+        a (np.ndarray): The values of the first group, shape (n_a, metrics).
+        b (np.ndarray): The values of the second group, shape (n_b, metrics).
+        n_resamples (int): Number of permutations.
+        rng (np.random.Generator, optional): The random generator.
+
+    Returns:
+        np.ndarray: The p-value of each metric.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    values = np.concatenate([a, b])
+    n_a = len(a)
+    observed = a.mean(axis=0) - b.mean(axis=0)
+
+    permutations = rng.random((n_resamples, len(values))).argsort(axis=1)
+    permuted = values[permutations]
+    differences = permuted[:, :n_a].mean(axis=1) - permuted[:, n_a:].mean(axis=1)
+
+    extreme = (np.abs(differences) >= np.abs(observed) - 1e-12).sum(axis=0)
+    return (extreme + 1) / (n_resamples + 1)
+
+
+def bootstrap_ci(a: np.ndarray, b: np.ndarray, n_resamples: int = 10000, confidence: float = 0.95,
+                 rng: np.random.Generator = None) -> tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap confidence interval of the difference of means (a - b), for many metrics at once.
+
+    Args:
+        a (np.ndarray): The values of the first group, shape (n_a, metrics).
+        b (np.ndarray): The values of the second group, shape (n_b, metrics).
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): The confidence level of the interval.
+        rng (np.random.Generator, optional): The random generator.
+
+    Returns:
+        tuple: The lower and upper bounds of each metric.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    samples_a = a[rng.integers(0, len(a), (n_resamples, len(a)))].mean(axis=1)
+    samples_b = b[rng.integers(0, len(b), (n_resamples, len(b)))].mean(axis=1)
+    differences = samples_a - samples_b
+    alpha = (1 - confidence) / 2
+    return np.quantile(differences, alpha, axis=0), np.quantile(differences, 1 - alpha, axis=0)
+
+
+def _compare_values(a: np.ndarray, b: np.ndarray, n_resamples: int, confidence: float,
+                    rng: np.random.Generator) -> dict:
+    """Group sizes, means, p-values and intervals of (n, metrics) arrays without missing values."""
+    result = {
+        'n_correct': np.full(a.shape[1], len(a)),
+        'n_incorrect': np.full(b.shape[1], len(b)),
+        'mean_correct': a.mean(axis=0) if len(a) else np.full(a.shape[1], np.nan),
+        'mean_incorrect': b.mean(axis=0) if len(b) else np.full(b.shape[1], np.nan),
+    }
+    if len(a) == 0 or len(b) == 0:
+        result['p_value'] = result['ci_low'] = result['ci_high'] = np.full(a.shape[1], np.nan)
+        return result
+
+    result['p_value'] = permutation_test(a, b, n_resamples, rng)
+    result['ci_low'], result['ci_high'] = bootstrap_ci(a, b, n_resamples, confidence, rng)
+    return result
+
+
+def _compare_question(question: str, metrics: pd.DataFrame, group_column: str, n_resamples: int,
+                      confidence: float, seed) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # metrics that don't exist in this question, e.g. the dwell of an AOI type the snippet doesn't have
+    metrics = metrics.dropna(axis=1, how='all')
+    metric_columns = [c for c in metrics.columns if c != group_column]
+    group = metrics[group_column].astype(bool).to_numpy()
+    values = metrics[metric_columns].to_numpy(dtype=float)
+
+    # the metrics without missing values are resampled together, the others one by one
+    # without the participants that don't have them, so a NaN never reaches the resamples
+    missing = np.isnan(values)
+    complete = ~missing.any(axis=0)
+    columns = {}
+    if complete.any():
+        batch = _compare_values(values[group][:, complete], values[~group][:, complete], n_resamples, confidence, rng)
+        for position, column in enumerate(np.flatnonzero(complete)):
+            columns[column] = {key: value[position] for key, value in batch.items()}
+    for column in np.flatnonzero(~complete):
+        present = ~missing[:, column]
+        a = values[group & present][:, [column]]
+        b = values[~group & present][:, [column]]
+        single = _compare_values(a, b, n_resamples, confidence, rng)
+        columns[column] = {key: value[0] for key, value in single.items()}
+
+    result = pd.DataFrame([{'question': question, 'metric': metric_columns[column], **columns[column]}
+                           for column in range(len(metric_columns))],
+                          columns=['question', 'metric', 'n_correct', 'n_incorrect', 'mean_correct',
+                                   'mean_incorrect', 'p_value', 'ci_low', 'ci_high'])
+    result.insert(6, 'difference', result['mean_correct'] - result['mean_incorrect'])
+    return result
+
+
+def select_metric_columns(metrics: pd.DataFrame, group_column: str = 'correct', question_column: str = 'question') -> pd.DataFrame:
+    """Keeps the question and group columns and the metrics of QuestionComparision.get_metrics_table
+    (time_to_complete, regression_count and the dwell_ columns) that are compared by compare_groups."""
+    return metrics[[question_column, group_column] + [c for c in metrics.columns if c == 'time_to_complete'
+                                                      or c == 'regression_count' or c.startswith('dwell_')]]
+
+
+def compare_groups(metrics: pd.DataFrame, group_column: str = 'correct', question_column: str = 'question',
+                   n_resamples: int = 10000, confidence: float = 0.95, n_jobs: int = None, seed: int = None) -> pd.DataFrame:
+    """Compares every metric between correct and incorrect participants, for each question.
+
+    Args:
+        metrics (pd.DataFrame): One row per participant and question, with the question column, the group column
+            (True for correct answers) and one numeric column per metric. Other non numeric columns are ignored.
+            Participants with a missing value in a metric are left out of the comparison of that metric only.
+        group_column (str): The boolean column with the groups.
+        question_column (str): The column with the question number.
+        n_resamples (int): Number of permutations and bootstrap resamples.
+        confidence (float): The confidence level of the bootstrap interval.
+        n_jobs (int, optional): Number of processes, the questions are split between them. Defaults to no pool.
+        seed (int, optional): Seed for reproducible results.
+
+    Returns:
+        pd.DataFrame: One row per question and metric, with the group sizes and means, the difference
+        (correct - incorrect), the permutation p-value and the bootstrap interval of the difference.
+    """
+    metrics = metrics.dropna(subset=[group_column])
+    metric_columns = metrics.drop(columns=[question_column, group_column]).select_dtypes(include='number').columns
+    questions = [(question, group[[group_column, *metric_columns]])
+                 for question, group in metrics.groupby(question_column)]
+    seeds = np.random.SeedSequence(seed).spawn(len(questions))
+
+    if n_jobs is None or n_jobs <= 1:
+        results = [_compare_question(question, group, group_column, n_resamples, confidence, s)
+                   for (question, group), s in zip(questions, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_compare_question, question, group, group_column, n_resamples, confidence, s)
+                       for (question, group), s in zip(questions, seeds)]
+            results = [future.result() for future in futures]
+
+    if len(results) == 0:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
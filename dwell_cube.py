@@ -0,0 +1,95 @@
+import pandas as pd
+from metadata import get_metadata
+
+
+class DwellCube:
+    """Total fixation duration indexed by (experiment, question, line), (experiment, question, token)
+    and (experiment, question, aoi), built once from the cleaned fixations.
+
+    Each cube is a Series computed with a single groupby over the fixations of every participant,
+    the queries are slices of these Series and don't touch the fixations again.
+    The 'aoi' level uses the types of our_tokenization ('Descricao') and 'out' for the lines outside the snippet,
+    like Question.most_readed_types.
+    """
+    LEVELS = {'line': 'source_file_line', 'token': 'token', 'aoi': 'aoi'}
+
+    def __init__(self, fixations: pd.DataFrame) -> None:
+        """
+        Args:
+            fixations (pd.DataFrame): The cleaned fixations of all participants, with the 'experiment' and 'question'
+                columns in the format used by Question ("05", "02").
+        """
+        fixations = fixations.assign(aoi=self._map_aois(fixations))
+        self.cubes: dict = {}
+        for level, column in self.LEVELS.items():
+            cube = fixations.groupby(['experiment', 'question', column])['duration'].sum()
+            cube.index = cube.index.set_names(level, level=2)
+            self.cubes[level] = cube.sort_index()
+
+    @classmethod
+    def from_questions(cls, questions: list) -> "DwellCube":
+        frames = []
+        for question in questions:
+            question.clean_data()
+            frames.append(question.data_frame[['source_file_line', 'token', 'duration']].assign(
+                experiment=question.experiment_number, question=question.question_number))
+        if len(frames) == 0:
+            frames = [pd.DataFrame(columns=['source_file_line', 'token', 'duration', 'experiment', 'question'])]
+        return cls(pd.concat(frames, ignore_index=True))
+
+    @staticmethod
+    def _map_aois(fixations: pd.DataFrame) -> pd.Series:
+        metadata = get_metadata()
+        maps = []
+        for question in fixations['question'].unique():
+            aoi_map = metadata.get_aoi_map(question)
+            if aoi_map is None:
+                continue
+            lower, upper = metadata.get_line_bounds(question)
+            maps.append(aoi_map.rename(columns={'Linha': 'source_file_line', 'Descricao': 'aoi'})
+                        .assign(question=question, lower=lower, upper=upper))
+        if len(maps) == 0:
+            return pd.Series(None, index=fixations.index, dtype=object)
+
+        maps = pd.concat(maps, ignore_index=True)
+        bounds = maps.drop_duplicates('question').set_index('question')[['lower', 'upper']]
+        lines = fixations[['question', 'source_file_line']]
+        aoi = lines.merge(maps[['question', 'source_file_line', 'aoi']].drop_duplicates(['question', 'source_file_line']),
+                          on=['question', 'source_file_line'], how='left')['aoi']
+        lower = fixations['question'].map(bounds['lower']).to_numpy()
+        upper = fixations['question'].map(bounds['upper']).to_numpy()
+        line = fixations['source_file_line'].to_numpy()
+        out = (line < lower) | (line > upper)
+        aoi = aoi.to_numpy(dtype=object)
+        aoi[out] = 'out'
+        return pd.Series(aoi, index=fixations.index)
+
+    def get(self, experiment: str, question: str, level: str = 'line') -> pd.Series:
+        """Returns the dwell of one participant in one question, indexed by line, token or aoi."""
+        try:
+            return self.cubes[level].loc[(experiment, question)]
+        except KeyError:
+            return pd.Series(dtype=float, name='duration')
+
+    def top(self, experiment: str, question: str, qtd_elements: int = 5, level: str = 'line') -> pd.Series:
+        """Returns the qtd_elements most read lines, tokens or aois of one participant in one question."""
+        return self.get(experiment, question, level).nlargest(qtd_elements)
+
+    def per_participant(self, question: str, level: str = 'line') -> pd.DataFrame:
+        """Returns a DataFrame with the dwell of each participant (columns) in each line, token or aoi of a question."""
+        cube = self.cubes[level]
+        return cube.xs(question, level='question').unstack('experiment', fill_value=0)
+
+    def pooled(self, question: str = None, level: str = 'line') -> pd.Series:
+        """Returns the total dwell of all participants in each line, token or aoi of a question,
+        or of all questions (indexed by question and line/token/aoi) if question is None."""
+        cube = self.cubes[level]
+        if question is None:
+            return cube.groupby(level=['question', level]).sum()
+        return cube.xs(question, level='question').groupby(level=level).sum()
+
+    def top_per_participant(self, question: str, qtd_elements: int = 5, level: str = 'line') -> pd.Series:
+        """Returns the qtd_elements most read lines, tokens or aois of each participant in a question,
+        indexed by (experiment, line/token/aoi)."""
+        cube = self.cubes[level].xs(question, level='question')
+        return cube.groupby(level='experiment', group_keys=False).nlargest(qtd_elements)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import TwoSlopeNorm
+from scipy import sparse as sp
+
+
+class DwellRaster:
+    """Duration weighted (line, col) dwell grids of many participants of the same question.
+
+    All the grids share the same bounds (the min and max line and column of all the fixations) and are
+    stored as one row per participant of a (participants, lines * cols) matrix, built with a single
+    np.bincount (dense) or a single scipy sparse matrix (sparse=True, better for long files with few fixations).
+    The cost is linear in the number of fixations.
+    """
+    def __init__(self, frames: list[pd.DataFrame], use_sparse: bool = False) -> None:
+        self.participants: int = len(frames)
+        self.use_sparse: bool = use_sparse
+
+        sizes = [len(df) for df in frames]
+        participant = np.repeat(np.arange(len(frames)), sizes)
+        data = pd.concat(frames, ignore_index=True) if len(frames) else pd.DataFrame(columns=['source_file_line', 'source_file_col', 'duration'])
+        line = data['source_file_line'].to_numpy(dtype=float)
+        col = data['source_file_col'].to_numpy(dtype=float)
+        duration = data['duration'].to_numpy(dtype=float)
+        valid = ~(np.isnan(line) | np.isnan(col) | np.isnan(duration))
+        line, col, duration, participant = line[valid].astype(int), col[valid].astype(int), duration[valid], participant[valid]
+
+        self.line_min: int = int(line.min()) if len(line) else 0
+        self.col_min: int = int(col.min()) if len(col) else 0
+        self.shape: tuple[int, int] = (int(line.max()) - self.line_min + 1 if len(line) else 1,
+                                       int(col.max()) - self.col_min + 1 if len(col) else 1)
+
+        cells = self.shape[0] * self.shape[1]
+        cell = (line - self.line_min) * self.shape[1] + (col - self.col_min)
+        if use_sparse:
+            self.grids = sp.csr_matrix((duration, (participant, cell)), shape=(self.participants, cells))
+        else:
+            self.grids = np.bincount(participant * cells + cell, weights=duration,
+                                     minlength=self.participants * cells).reshape(self.participants, cells)
+
+    def grid(self, participant: int) -> np.ndarray:
+        """Returns the dense (lines, cols) grid of one participant."""
+        row = self.grids[participant]
+        if self.use_sparse:
+            row = row.toarray()
+        return np.asarray(row).reshape(self.shape)
+
+    def group_mean(self, mask) -> np.ndarray:
+        """Returns the sum of the grids of the participants in mask divided by the group size."""
+        mask = np.asarray(mask, dtype=bool)
+        if mask.sum() == 0:
+            return np.zeros(self.shape)
+        total = self.grids[mask].sum(axis=0)
+        return np.asarray(total).reshape(self.shape) / mask.sum()
+
+    def difference(self, correct) -> np.ndarray:
+        """Returns the mean grid of the correct participants minus the mean grid of the incorrect ones."""
+        correct = np.asarray(correct, dtype=bool)
+        return self.group_mean(correct) - self.group_mean(~correct)
+
+    def plot_difference(self, correct, title: str = None, path: str = None, dpi: int = 150) -> None:
+        """Plots the correct - incorrect heatmap with a single draw call, green is more dwell of the
+        correct participants and red more dwell of the incorrect ones.
+
+        Args:
+            correct (list[bool]): If each participant answered correctly.
+            title (str, optional): The title of the plot.
+            path (str, optional): Where the image is saved, if not given the plot is shown.
+            dpi (int, optional): The dpi of the saved image.
+        """
+        difference = self.difference(correct)
+        limit = np.abs(difference).max() or 1
+
+        plt.figure(figsize=(10, 8))
+        plt.imshow(difference, cmap='RdYlGn', norm=TwoSlopeNorm(0, -limit, limit), aspect='auto', interpolation='nearest',
+                   extent=(self.col_min - 0.5, self.col_min + self.shape[1] - 0.5,
+                           self.line_min + self.shape[0] - 0.5, self.line_min - 0.5))
+        plt.colorbar(label='Mean dwell difference (correct - incorrect)')
+        plt.xlabel('Source File Column')
+        plt.ylabel('Source File Line')
+        if title is not None:
+            plt.title(title)
+
+        if path is not None:
+            plt.savefig(path, dpi=dpi)
+            plt.close()
+        else:
+            plt.show()
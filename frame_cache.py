@@ -0,0 +1,120 @@
+import os
+from collections import OrderedDict
+import pandas as pd
+
+
+class FrameCache:
+    """LRU cache for the cleaned fixation DataFrames of the Question objects, limited by memory.
+
+    When the total size of the frames goes over max_bytes the least recently used ones are evicted
+    (and the SQLite connection of their Question is closed). When an evicted frame is accessed again
+    it is reloaded from the fastest available source:
+        1. the pickle saved in spill_dir when it was evicted (if spill_dir was given)
+        2. the .db3 file, cleaning the fixations again
+
+    The hits, misses, evictions and reloads are counted, see stats().
+    """
+    def __init__(self, max_bytes: int, spill_dir: str = None) -> None:
+        self.max_bytes: int = max_bytes
+        self.spill_dir: str = spill_dir
+        self.frames: OrderedDict = OrderedDict()
+        self.sizes: dict = {}
+        self.spilled: dict = {}
+        self.current_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.reloads: int = 0
+        self._owners: dict = {}
+        self._spill_count: int = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, question) -> pd.DataFrame:
+        """Returns the frame of the question, reloading it if it was evicted.
+
+        Returns:
+            pd.DataFrame: The cleaned fixations, or None if the question was never cleaned.
+        """
+        key = question.full_path
+        if key in self.frames:
+            self.hits += 1
+            self.frames.move_to_end(key)
+            return self.frames[key]
+
+        if key not in self._owners:
+            return None
+
+        self.misses += 1
+        self.reloads += 1
+        if key in self.spilled and os.path.exists(self.spilled[key]):
+            df = pd.read_pickle(self.spilled[key])
+        else:
+            df = question.read_clean_fixations()
+        self._store(key, df)
+        return df
+
+    def put(self, question, df: pd.DataFrame) -> None:
+        key = question.full_path
+        self._drop_spilled(key)
+        if key in self.frames:
+            self._remove(key)
+        if df is None:
+            self._owners.pop(key, None)
+        else:
+            self._owners[key] = question
+            self._store(key, df)
+
+    def _drop_spilled(self, key: str) -> None:
+        path = self.spilled.pop(key, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def _store(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        self.frames[key] = df
+        self.sizes[key] = size
+        self.current_bytes += size
+        self._evict(keep=key)
+
+    def _remove(self, key: str) -> pd.DataFrame:
+        df = self.frames.pop(key)
+        self.current_bytes -= self.sizes.pop(key)
+        return df
+
+    def _evict(self, keep: str) -> None:
+        while self.current_bytes > self.max_bytes and len(self.frames) > 1:
+            key = next(iter(self.frames))
+            if key == keep:
+                break
+            df = self._remove(key)
+            self.evictions += 1
+            if self.spill_dir is not None and key not in self.spilled:
+                self._spill_count += 1
+                path = os.path.join(self.spill_dir, f"frame_{self._spill_count}_{os.path.basename(key)}.pkl")
+                df.to_pickle(path)
+                self.spilled[key] = path
+            self._owners[key].close()
+
+    def clear(self) -> None:
+        """Removes every frame and spilled file, the next access reloads them from the .db3 files."""
+        for path in self.spilled.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self.frames.clear()
+        self.sizes.clear()
+        self.spilled.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+            'reloads': self.reloads,
+            'entries': len(self.frames),
+            'current_bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
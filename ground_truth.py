@@ -0,0 +1,151 @@
+import os
+import unicodedata
+import pandas as pd
+
+
+def _resolve_path(path: str) -> str:
+    """Finds the file on disk even when its name was saved with a different unicode
+    normalization (e.g. 'código' written as 'co' + combining accent on macOS).
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: The path that exists on disk, or the original path if none matches.
+    """
+    if os.path.exists(path):
+        return path
+
+    directory, name = os.path.split(path)
+    target = unicodedata.normalize("NFC", name)
+    for candidate in os.listdir(directory or "."):
+        if unicodedata.normalize("NFC", candidate) == target:
+            return os.path.join(directory, candidate)
+    return path
+
+
+def to_key(value) -> str:
+    """Converts an experiment or question number to the two digits string used by Question.
+
+    Args:
+        value (int | str): The number, as int (5) or str ("5", "05").
+
+    Returns:
+        str: The number with two digits ("05").
+    """
+    return f"{int(value):02d}"
+
+
+class GroundTruth:
+    """Loads all the answer sources once in a single table indexed by (experiment, question).
+
+    The table has the following columns:
+        correct: if the participant answered the question correctly (respostas.csv)
+        explanation_grade: 'Correto', 'Parcialmente Correto' or 'Incorreto' (correctXincorrect_vinicius_2.csv)
+        had_difficulty: if the participant reported difficulty in the question
+        participant_answer: the explanation written by the participant
+        answer_analysis: the analysis of the participant explanation
+
+    In the explanation csvs the 'Developer' column is the experiment number and the
+    'Code Snippet' column is the question number.
+    """
+    def __init__(self, answer_path: str = 'respostas.csv',
+                 explanation_path: str = 'explicacoes_trecho_código.csv',
+                 grade_path: str = 'correctXincorrect_vinicius_2.csv') -> None:
+        self.answer_path: str = answer_path
+        self.explanation_path: str = explanation_path
+        self.grade_path: str = grade_path
+        self.table: pd.DataFrame = None
+        self._lookup: dict = {}
+        self.load()
+
+    def load(self) -> None:
+        """Reads and merges the answer, grade and explanation csvs.
+        The explanation files are optional, if they are not found the columns are filled with NaN.
+        """
+        answers = pd.read_csv(self.answer_path, dtype=str)
+        answers = pd.DataFrame({
+            'experiment': answers['Experimento'].map(to_key),
+            'question': answers['questao'].map(to_key),
+            'correct': answers['acerto'].str.strip().str.lower() == 'true',
+        })
+
+        grade_path = _resolve_path(self.grade_path)
+        if os.path.exists(grade_path):
+            grades = pd.read_csv(grade_path, sep=';', dtype=str)
+            grades = pd.DataFrame({
+                'experiment': grades['Developer'].map(to_key),
+                'question': grades['Code Snippet'].map(to_key),
+                'explanation_grade': grades['Explanation'],
+                'had_difficulty': grades['Had Difficulty'].str.strip().str.lower().map({'true': True, 'false': False}),
+            })
+        else:
+            grades = pd.DataFrame(columns=['experiment', 'question', 'explanation_grade', 'had_difficulty'])
+
+        explanation_path = _resolve_path(self.explanation_path)
+        if os.path.exists(explanation_path):
+            explanations = pd.read_csv(explanation_path, sep=';', dtype=str)
+            explanations = pd.DataFrame({
+                'experiment': explanations['Developer'].map(to_key),
+                'question': explanations['Code Snippet'].map(to_key),
+                'participant_answer': explanations['Resposta do Participante'],
+                'answer_analysis': explanations['Análise da Resposta'],
+            })
+        else:
+            explanations = pd.DataFrame(columns=['experiment', 'question', 'participant_answer', 'answer_analysis'])
+
+        table = answers.merge(grades, on=['experiment', 'question'], how='outer')
+        table = table.merge(explanations, on=['experiment', 'question'], how='outer')
+        table = table.drop_duplicates(subset=['experiment', 'question'])
+        self.table = table.set_index(['experiment', 'question']).sort_index()
+        self._lookup = self.table.to_dict('index')
+
+    def get(self, experiment, question) -> dict:
+        """Returns all the ground truth columns for one question of one experiment.
+
+        Args:
+            experiment (int | str): The experiment number.
+            question (int | str): The question number.
+
+        Returns:
+            dict: The columns of the table, or an empty dict if the pair is not found.
+        """
+        return self._lookup.get((to_key(experiment), to_key(question)), {})
+
+    def is_correct(self, experiment, question) -> bool:
+        """Returns if the participant of the experiment answered the question correctly.
+
+        Args:
+            experiment (int | str): The experiment number.
+            question (int | str): The question number.
+
+        Returns:
+            bool: True if correct, False if incorrect or not found.
+        """
+        return bool(self.get(experiment, question).get('correct', False))
+
+    def join(self, df: pd.DataFrame, experiment_column: str = 'experiment', question_column: str = 'question') -> pd.DataFrame:
+        """Joins the ground truth columns onto a fixation or metric table.
+
+        Args:
+            df (pd.DataFrame): The table, it must have the experiment and question columns
+                (or index levels) with the same format used by Question ("05", "02").
+            experiment_column (str): The name of the experiment column.
+            question_column (str): The name of the question column.
+
+        Returns:
+            pd.DataFrame: A new DataFrame with the ground truth columns added.
+        """
+        keys = pd.MultiIndex.from_arrays([
+            df[experiment_column].map(to_key) if experiment_column in df else df.index.get_level_values(experiment_column).map(to_key),
+            df[question_column].map(to_key) if question_column in df else df.index.get_level_values(question_column).map(to_key),
+        ])
+        truth = self.table.reindex(keys)
+        truth.index = df.index
+        return pd.concat([df, truth], axis=1)
+
+
+if __name__ == "__main__":
+    gt = GroundTruth()
+    print(gt.table)
+    print(gt.get(5, 2))
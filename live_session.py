@@ -0,0 +1,233 @@
+import os
+import time
+import sqlite3
+import pandas as pd
+import utilities as ut
+from metadata import get_metadata
+
+
+class LiveSession:
+    """Incremental ingestion of an iTrace .db3 that is still being written.
+
+    Each poll reads only the rows of the fixation and ide_context tables with a rowid bigger than the
+    last one read, so the cost of a poll depends on the new rows, not on the session size.
+    The white spaces are redistributed with the same rule of Question.clean_data. A white space needs
+    its next fixation to be decided, so the last fixations (the last valid one and the white spaces after it)
+    are kept in self.tail until the next poll, or until finish() is called when the session ends.
+
+    The metrics of the session are updated after each poll, see get_metrics().
+    """
+    def __init__(self, full_path: str, question_number: str = None) -> None:
+        self.full_path: str = full_path
+        self.question_number: str = question_number or ut.split_path(full_path)[-2]
+        self.connection: sqlite3.Connection = None
+        self.fixation_rowid: int = 0
+        self.ide_rowid: int = 0
+        self.tail: pd.DataFrame = None
+        self.finished: bool = False
+        self.total_size: int = 0
+        self.white_spaces_count: int = 0
+        self.fixation_count: int = 0
+        self.first_time_stamp: int = None
+        self.last_time_stamp: int = None
+        self.line_dwell: pd.Series = pd.Series(dtype=float)
+        self.type_dwell: pd.Series = pd.Series(dtype=float)
+        self._position_sums: list[float] = [0.0, 0.0, 0.0, 0.0]
+        self._subscribers: list = []
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(f"file:{os.path.abspath(self.full_path)}?mode=ro", uri=True)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def subscribe(self, callback) -> None:
+        """Registers a function called with the metrics dict after each poll that read new rows."""
+        self._subscribers.append(callback)
+
+    def _read_new_rows(self, table: str, columns: str, rowid: int) -> pd.DataFrame:
+        try:
+            return pd.read_sql_query(f"SELECT rowid AS row_id, {columns} from {table} WHERE rowid > ? ORDER BY rowid",
+                                     self.connection, params=(rowid,))
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            # the table is not created yet
+            return pd.DataFrame()
+
+    def poll(self) -> dict:
+        """Reads the new rows of the database and updates the metrics.
+
+        Returns:
+            dict: The updated metrics.
+        """
+        self.connect()
+        new_ide = self._read_new_rows("ide_context", "time_stamp", self.ide_rowid)
+        if len(new_ide) > 0:
+            self.ide_rowid = int(new_ide['row_id'].max())
+            time_stamps = new_ide['time_stamp'].astype('int64')
+            self.first_time_stamp = time_stamps.min() if self.first_time_stamp is None else min(self.first_time_stamp, time_stamps.min())
+            self.last_time_stamp = time_stamps.max() if self.last_time_stamp is None else max(self.last_time_stamp, time_stamps.max())
+
+        new_fixations = self._read_new_rows("fixation", "*", self.fixation_rowid)
+        if len(new_fixations) > 0:
+            self.fixation_rowid = int(new_fixations['row_id'].max())
+            self._ingest(new_fixations)
+
+        metrics = self.get_metrics()
+        if len(new_ide) > 0 or len(new_fixations) > 0:
+            for callback in self._subscribers:
+                callback(metrics)
+        return metrics
+
+    def _ingest(self, new_fixations: pd.DataFrame) -> None:
+        self.total_size += len(new_fixations)
+        self.white_spaces_count += ut.found_white_space(new_fixations, "WHITESPACE", "token", False)
+
+        frame = new_fixations if self.tail is None else pd.concat([self.tail, new_fixations], ignore_index=True)
+        white = (frame['token'] == "WHITESPACE").to_numpy()
+        valid_positions = (~white).nonzero()[0]
+        if len(valid_positions) == 0:
+            self.tail = frame
+            return
+
+        # every white space before the last valid fixation already has its next neighbour
+        last_valid = valid_positions[-1]
+        self._aggregate(ut.redistribute_white_space(frame.iloc[:last_valid + 1]))
+
+        tail = frame.iloc[last_valid:].reset_index(drop=True)
+        tail['_anchor'] = tail.index == 0
+        tail.loc[0, 'duration'] = 0
+        self.tail = tail
+
+    def _aggregate(self, cleaned: pd.DataFrame) -> None:
+        """Adds the cleaned fixations to the metrics. The anchor row (the last valid fixation of the
+        previous poll) has duration 0 plus what it received from the white spaces, so it only adds that delta.
+        """
+        if '_anchor' in cleaned:
+            new_rows = cleaned[cleaned['_anchor'] != True]
+        else:
+            new_rows = cleaned
+
+        self.fixation_count += len(new_rows)
+        line = new_rows['source_file_line'].astype(float)
+        col = new_rows['source_file_col'].astype(float)
+        self._position_sums[0] += line.sum()
+        self._position_sums[1] += (line ** 2).sum()
+        self._position_sums[2] += col.sum()
+        self._position_sums[3] += (col ** 2).sum()
+
+        line_dwell = cleaned.groupby('source_file_line')['duration'].sum()
+        self.line_dwell = self.line_dwell.add(line_dwell, fill_value=0)
+
+        aoi_map = get_metadata().get_aoi_map(self.question_number)
+        if aoi_map is not None:
+            lower, upper = get_metadata().get_line_bounds(self.question_number)
+            types = line_dwell.index.map(dict(zip(aoi_map['Linha'], aoi_map['Descricao'])))
+            types = types.where((line_dwell.index >= lower) & (line_dwell.index <= upper), 'out')
+            type_dwell = line_dwell.groupby(types).sum()
+            self.type_dwell = self.type_dwell.add(type_dwell, fill_value=0)
+
+    def finish(self) -> dict:
+        """Reads the last rows and closes the session, giving the duration of the trailing white spaces."""
+        metrics = self.poll()
+        if self.tail is not None and not self.finished:
+            self._aggregate(ut.redistribute_white_space(self.tail))
+            self.tail = None
+            metrics = self.get_metrics()
+        self.finished = True
+        self.close()
+        return metrics
+
+    def get_variance(self) -> float:
+        n = self.fixation_count
+        if n < 2:
+            return None
+        line_sum, line_square_sum, col_sum, col_square_sum = self._position_sums
+        line_variance = (line_square_sum - line_sum ** 2 / n) / (n - 1)
+        col_variance = (col_square_sum - col_sum ** 2 / n) / (n - 1)
+        return line_variance + col_variance
+
+    def get_metrics(self) -> dict:
+        time_to_complete = None
+        if self.first_time_stamp is not None:
+            time_to_complete = int((self.last_time_stamp - self.first_time_stamp) / 1000)
+        return {
+            'question': self.question_number,
+            'total_size': self.total_size,
+            'white_spaces_count': self.white_spaces_count,
+            'white_spaces_percentage': self.white_spaces_count / self.total_size if self.total_size else 0.0,
+            'fixation_count': self.fixation_count,
+            'time_to_complete': time_to_complete,
+            'variance': self.get_variance(),
+            'line_dwell': self.line_dwell.to_dict(),
+            'most_readed_types': self.type_dwell.sort_values(ascending=False).to_dict(),
+            'finished': self.finished,
+        }
+
+    def run(self, interval: float = 1.0, idle_polls: int = None) -> dict:
+        """Polls the database every interval seconds.
+
+        Args:
+            interval (float): Seconds between polls.
+            idle_polls (int, optional): Finish the session after this number of polls without new rows.
+                Defaults to never finish.
+
+        Returns:
+            dict: The final metrics.
+        """
+        idle = 0
+        while idle_polls is None or idle < idle_polls:
+            fixation_rowid, ide_rowid = self.fixation_rowid, self.ide_rowid
+            self.poll()
+            if (fixation_rowid, ide_rowid) == (self.fixation_rowid, self.ide_rowid):
+                idle += 1
+            else:
+                idle = 0
+            time.sleep(interval)
+        return self.finish()
+
+
+def simulate_session(source_path: str, target_path: str, batch_size: int = 20, interval: float = 0.1) -> None:
+    """Copies a finished .db3 to target_path in batches, like iTrace writing during the experiment.
+    Useful to test the LiveSession against a local file.
+
+    Args:
+        source_path (str): The finished .db3.
+        target_path (str): The .db3 to be written, it is replaced if it exists.
+        batch_size (int): Number of fixation rows written in each batch.
+        interval (float): Seconds between batches.
+    """
+    source = sqlite3.connect(source_path)
+    fixations = pd.read_sql_query("SELECT * from fixation", source)
+    ide = pd.read_sql_query("SELECT * from ide_context", source)
+    source.close()
+
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    target = sqlite3.connect(target_path)
+    ide_batch_size = max(1, len(ide) * batch_size // max(len(fixations), 1))
+    for start in range(0, max(len(fixations), 1), batch_size):
+        batch = start // batch_size
+        fixations.iloc[start:start + batch_size].to_sql("fixation", target, index=False, if_exists="append")
+        ide.iloc[batch * ide_batch_size:(batch + 1) * ide_batch_size].to_sql("ide_context", target, index=False, if_exists="append")
+        target.commit()
+        time.sleep(interval)
+    ide.iloc[(batch + 1) * ide_batch_size:].to_sql("ide_context", target, index=False, if_exists="append")
+    target.commit()
+    target.close()
+
+
+if __name__ == "__main__":
+    import threading
+    source = os.path.join("experimentos", "Experimento 05", "Sem Dejavu", "02", "db02.db3")
+    target = os.path.join("live", "02", "db02.db3")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    writer = threading.Thread(target=simulate_session, args=(source, target))
+    writer.start()
+    time.sleep(0.2)
+    session = LiveSession(target)
+    session.subscribe(lambda metrics: print(metrics['fixation_count'], metrics['time_to_complete'], metrics['most_readed_types']))
+    print(session.run(interval=0.1, idle_polls=5))
+    writer.join()
@@ -0,0 +1,83 @@
+import os
+import json
+import pandas as pd
+
+INFO_PATH = os.path.join("codes", "info.json")
+TOKENIZATION_DIR = "our_tokenization"
+
+
+class SnippetMetadata:
+    """Registry with the metadata of the code snippets, each file is parsed only once.
+
+    It holds:
+        info: the smell and severity of each snippet (codes/info.json)
+        aoi_maps: the areas of interest of each snippet, a DataFrame with the columns 'Linha' and 'Descricao'
+        (our_tokenization/XX_Code_Snippet.csv)
+        line_bounds: the first and last line of each snippet
+
+    The object only has plain dicts and DataFrames, so it can be pickled and sent to worker processes,
+    call load_all before doing it so the workers don't need to read the files again.
+    """
+    def __init__(self, info_path: str = INFO_PATH, tokenization_dir: str = TOKENIZATION_DIR) -> None:
+        self.info_path: str = os.path.normpath(info_path)
+        self.tokenization_dir: str = os.path.normpath(tokenization_dir)
+        self.info: dict = None
+        self.aoi_maps: dict = {}
+        self.line_bounds: dict = {}
+
+    def load_info(self) -> dict:
+        if self.info is None:
+            with open(self.info_path) as f:
+                self.info = json.load(f)
+        return self.info
+
+    def get_smell(self, question_number: str) -> str:
+        return self.load_info()[question_number]["smell"]
+
+    def get_severity(self, question_number: str) -> str:
+        return self.load_info()[question_number]["severity"]
+
+    def get_aoi_map(self, question_number: str) -> pd.DataFrame:
+        """Returns the areas of interest of a snippet.
+
+        Args:
+            question_number (str): The question number, with two digits ("02").
+
+        Returns:
+            pd.DataFrame: The columns 'Linha' and 'Descricao', or None if the snippet has no tokenization (question "01").
+        """
+        if question_number not in self.aoi_maps:
+            path = os.path.join(self.tokenization_dir, question_number + "_Code_Snippet.csv")
+            if os.path.exists(path):
+                df = pd.read_csv(path)
+                self.aoi_maps[question_number] = df
+                self.line_bounds[question_number] = (df['Linha'].min(), df['Linha'].max())
+            else:
+                self.aoi_maps[question_number] = None
+                self.line_bounds[question_number] = None
+        return self.aoi_maps[question_number]
+
+    def get_line_bounds(self, question_number: str) -> tuple:
+        """Returns the (lower, upper) lines of a snippet, or None if the snippet has no tokenization."""
+        self.get_aoi_map(question_number)
+        return self.line_bounds[question_number]
+
+    def load_all(self) -> None:
+        """Parses every metadata file, useful before pickling the registry to worker processes."""
+        if os.path.exists(self.info_path):
+            self.load_info()
+        if os.path.isdir(self.tokenization_dir):
+            for file in os.listdir(self.tokenization_dir):
+                if file.endswith("_Code_Snippet.csv"):
+                    self.get_aoi_map(file.split("_")[0])
+
+
+_registries: dict = {}
+
+
+def get_metadata(info_path: str = INFO_PATH, tokenization_dir: str = TOKENIZATION_DIR) -> SnippetMetadata:
+    """Returns the process-wide registry for the given paths, creating it on the first call."""
+    key = (os.path.normpath(info_path), os.path.normpath(tokenization_dir))
+    if key not in _registries:
+        _registries[key] = SnippetMetadata(info_path, tokenization_dir)
+    return _registries[key]
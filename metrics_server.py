@@ -0,0 +1,207 @@
+import asyncio
+import json
+import math
+import ipaddress
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+from question_comp import QuestionComparision
+from ground_truth import GroundTruth, to_key
+from correctness_stats import compare_groups, select_metric_columns
+
+# the resamples of a question are one (n_resamples, participants, metrics) array, so the value is capped
+MAX_RESAMPLES = 100000
+
+
+def _to_json(data) -> bytes:
+    """Serializes pandas/numpy results, NaN values are written as null."""
+    def default(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (pd.Series, pd.Index)):
+            return value.tolist()
+        return str(value)
+
+    def clean(value):
+        if isinstance(value, dict):
+            return {str(k): clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        if isinstance(value, (float, np.floating)) and math.isnan(value):
+            return None
+        if isinstance(value, np.generic):
+            return clean(value.item())
+        return value
+
+    return json.dumps(clean(data), default=default).encode()
+
+
+class MetricsServer:
+    """Local HTTP service that loads the experiments directory once and answers JSON queries
+    from the cleaned data kept in memory.
+
+    Endpoints (all GET):
+        /questions: the questions and the experiments that answered each one
+        /metrics/{question}: the metrics of each participant (see QuestionComparision.get_metrics_table) and the ground truth
+        /metrics/{question}/{experiment}: the metrics of one participant
+        /top/{question}?level=line&n=5&experiment=05: the top n lines, tokens or aois (level), of one participant
+            or of all participants pooled if experiment is not given
+        /correctness/{question}?n_resamples=10000: the correct x incorrect comparison of each metric,
+            n_resamples must be between 1 and MAX_RESAMPLES
+
+    The responses are cached (LRU with max_cached_responses entries), and the slow computations run in a
+    thread so other requests keep being answered. The server only binds to loopback addresses.
+    """
+    def __init__(self, experiments_dir: str, answer_path: str = 'respostas.csv', host: str = '127.0.0.1',
+                 port: int = 8765, max_cached_responses: int = 1024, **comparison_kwargs) -> None:
+        if not (host == 'localhost' or ipaddress.ip_address(host).is_loopback):
+            raise ValueError(f"The metrics server only runs on localhost, got host {host}")
+        self.experiments_dir: str = experiments_dir
+        self.answer_path: str = answer_path
+        self.host: str = host
+        self.port: int = port
+        self.max_cached_responses: int = max_cached_responses
+        self.comparison_kwargs: dict = comparison_kwargs
+        self.comparison: QuestionComparision = None
+        self.metrics: pd.DataFrame = None
+        self.responses: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self._server: asyncio.AbstractServer = None
+        self._locks: dict = {}
+
+    def load(self) -> None:
+        """Reads every .db3 and builds the metrics table and the dwell cube, it is called once on start."""
+        comparison = QuestionComparision(self.experiments_dir, **self.comparison_kwargs)
+        comparison.get_questions_for_experiments()
+        comparison.get_dwell_cube()
+        self.metrics = GroundTruth(self.answer_path).join(comparison.get_metrics_table())
+        self.comparison = comparison
+
+    def _questions(self) -> dict:
+        result = {}
+        for experiment in self.comparison.questions:
+            for question in self.comparison.questions[experiment]:
+                result.setdefault(question.question_number, []).append(question.experiment_number)
+        return {question: sorted(experiments) for question, experiments in sorted(result.items())}
+
+    def _metrics(self, question: str, experiment: str = None) -> list:
+        rows = self.metrics[self.metrics['question'] == question]
+        if experiment is not None:
+            rows = rows[rows['experiment'] == experiment]
+        rows = rows.dropna(axis=1, how='all')
+        return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+    def _top(self, question: str, level: str, qtd_elements: int, experiment: str = None) -> dict:
+        cube = self.comparison.get_dwell_cube()
+        if level not in cube.cubes:
+            raise KeyError(f"level must be one of {list(cube.cubes)}")
+        if experiment is not None:
+            return cube.top(experiment, question, qtd_elements, level).to_dict()
+        return cube.pooled(question, level).nlargest(qtd_elements).to_dict()
+
+    def _correctness(self, question: str, n_resamples: int) -> list:
+        metrics = select_metric_columns(self.metrics[self.metrics['question'] == question])
+        result = compare_groups(metrics, n_resamples=n_resamples, seed=0)
+        return result.astype(object).where(result.notna(), None).to_dict('records')
+
+    async def route(self, path: str, query: dict):
+        """Returns the (status, data) of a request."""
+        parts = [part for part in path.split('/') if part]
+        if parts == ['questions']:
+            return 200, self._questions()
+        if parts == ['stats']:
+            return 200, {'hits': self.hits, 'misses': self.misses, 'cached_responses': len(self.responses)}
+        if len(parts) in (2, 3) and parts[0] == 'metrics':
+            experiment = to_key(parts[2]) if len(parts) == 3 else None
+            return 200, self._metrics(to_key(parts[1]), experiment)
+        if len(parts) == 2 and parts[0] == 'top':
+            experiment = to_key(query['experiment'][0]) if 'experiment' in query else None
+            level = query.get('level', ['line'])[0]
+            qtd_elements = int(query.get('n', ['5'])[0])
+            return 200, self._top(to_key(parts[1]), level, qtd_elements, experiment)
+        if len(parts) == 2 and parts[0] == 'correctness':
+            n_resamples = int(query.get('n_resamples', ['10000'])[0])
+            if not 1 <= n_resamples <= MAX_RESAMPLES:
+                raise ValueError(f"n_resamples must be between 1 and {MAX_RESAMPLES}")
+            result = await asyncio.get_running_loop().run_in_executor(None, self._correctness, to_key(parts[1]), n_resamples)
+            return 200, result
+        return 404, {'error': f"Unknown endpoint {path}"}
+
+    async def respond(self, target: str) -> tuple[int, bytes]:
+        """Returns the status and body of a request target, using the response cache."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        key = url.path + '?' + '&'.join(f"{k}={v[0]}" for k, v in sorted(query.items()))
+        if key in self.responses:
+            self.hits += 1
+            self.responses.move_to_end(key)
+            return self.responses[key]
+
+        # concurrent requests of the same uncached key wait for the first one instead of computing it again
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                if key in self.responses:
+                    self.hits += 1
+                    return self.responses[key]
+                self.misses += 1
+                try:
+                    status, data = await self.route(url.path, query)
+                except (KeyError, ValueError) as error:
+                    status, data = 400, {'error': str(error.args[0]) if error.args else str(error)}
+                except Exception as error:
+                    status, data = 500, {'error': f"{type(error).__name__}: {error}"}
+                response = (status, _to_json(data))
+                if status == 200 and not url.path.startswith('/stats'):
+                    self.responses[key] = response
+                    if len(self.responses) > self.max_cached_responses:
+                        self.responses.popitem(last=False)
+        finally:
+            self._locks.pop(key, None)
+        return response
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                status, body = 405, _to_json({'error': 'Only GET is supported'})
+            else:
+                try:
+                    status, body = await self.respond(request_line[1])
+                except Exception as error:
+                    status, body = 500, _to_json({'error': f"{type(error).__name__}: {error}"})
+            reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                      500: 'Internal Server Error'}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        """Loads the data (in a thread) and starts listening."""
+        if self.comparison is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"Serving eye tracking metrics on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+
+if __name__ == "__main__":
+    experiments_dir = "C:/Users/Pedro/OneDrive/Área de Trabalho/dataAnal/experimentos"
+    asyncio.run(MetricsServer(experiments_dir).serve_forever())
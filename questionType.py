@@ -6,13 +6,18 @@ import seaborn as sns
 from datetime import datetime
 from scipy.stats import gaussian_kde
 import numpy as np
-import json
+import os
+from metadata import get_metadata
+from saccades import extract_saccades
+from frame_cache import FrameCache
 
 class Question:
-    def __init__(self, full_path) -> None:
+    def __init__(self, full_path, frame_cache: FrameCache = None, clean: bool = True) -> None:
         self.full_path: str = full_path
-        self.question_number: str = full_path.split("\\")[-2]
-        self.experiment_number: str = full_path.split("\\")[-4].split(" ")[-1]
+        self.frame_cache: FrameCache = frame_cache
+        path_parts = ut.split_path(full_path)
+        self.question_number: str = path_parts[-2]
+        self.experiment_number: str = path_parts[-4].split(" ")[-1]
         self.total_size: int = None
         self.white_spaces_percentage: float = None
         self.nan_percentage: float = None
@@ -22,9 +27,25 @@ class Question:
         self.time_to_complete: float = None
         self.most_readed_types: dict = {}
         self.variance: float = None
-        self.get_most_readed_types()
+        if clean:
+            self.get_most_readed_types()
         self.smell = self.set_smell(self.question_number)
         self.most_readed_lines = None
+        self.saccades: pd.DataFrame = None
+        self.dwell: dict = {}
+
+    @property
+    def data_frame(self) -> pd.DataFrame:
+        if self.frame_cache is None:
+            return self._data_frame
+        return self.frame_cache.get(self)
+
+    @data_frame.setter
+    def data_frame(self, df: pd.DataFrame):
+        if self.frame_cache is None:
+            self._data_frame = df
+        else:
+            self.frame_cache.put(self, df)
 
     def connect(self):
         try:
@@ -34,19 +55,24 @@ class Question:
             print("Não foi possivel encontrar o database, favor verificar o caminho passado")
             print(" -> Se seu caminho estiver usando apenas uma '/' troque para '//', isso pode solucionar o problema")
 
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
     def clean_data(self):
+        if self.total_size is not None:
+            return
+
         if self.connection == None:
             self.connect()
 
-        elif self.data_frame is not None:
-            return
-
         print(self.experiment_number, self.question_number)
-        self.data_frame = pd.read_sql_query("SELECT * from fixation", self.connection)
-        self.total_size = len(self.data_frame)
-        self.white_spaces_percentage = ut.found_white_space(self.data_frame, "WHITESPACE", "token")
-        self.white_spaces_count = ut.found_white_space(self.data_frame, "WHITESPACE", "token", False)
-        ut.remove_white_space_by_proximity(self.data_frame)
+        df = pd.read_sql_query("SELECT * from fixation", self.connection)
+        self.total_size = len(df)
+        self.white_spaces_percentage = ut.found_white_space(df, "WHITESPACE", "token")
+        self.white_spaces_count = ut.found_white_space(df, "WHITESPACE", "token", False)
+        self.data_frame = ut.redistribute_white_space(df)
 
         df_ide = pd.read_sql_query("SELECT time_stamp from ide_context", self.connection)
         
@@ -55,6 +81,28 @@ class Question:
 
         self.variance = self.data_frame['source_file_line'].var() + self.data_frame['source_file_col'].var()
 
+    def read_clean_fixations(self) -> pd.DataFrame:
+        """Reads the fixations from the .db3 again and removes the white spaces, without
+        recomputing the statistics. Used by the FrameCache to reload an evicted frame.
+        """
+        if self.connection == None:
+            self.connect()
+
+        df = pd.read_sql_query("SELECT * from fixation", self.connection)
+        return ut.redistribute_white_space(df)
+
+    def set_clean_data(self, data_frame: pd.DataFrame, total_size: int, white_spaces_count: int,
+                       time_to_complete: int, variance: float):
+        """Sets the result of a cleaning done outside the question, by QuestionComparision.clean_data_batch."""
+        self.total_size = total_size
+        self.white_spaces_count = white_spaces_count
+        self.white_spaces_percentage = white_spaces_count / total_size if total_size else 0.0
+        self.time_to_complete = time_to_complete
+        self.variance = variance
+        self.data_frame = data_frame
+        self.dwell = {}
+        self.saccades = None
+
     def generate_tsv_file(self):
         if self.connection == None:
             self.connect()
@@ -64,8 +112,14 @@ class Question:
         df = pd.read_sql_query(sql, self.connection)
         df.to_csv(self.full_path[:-8]+"question_"+self.question_number+".tsv", sep='\t', index=False)
 
+    def get_dwell(self, column: str) -> pd.Series:
+        """Returns the total duration grouped by column ('source_file_line' or 'token'), computed only once."""
+        if column not in self.dwell:
+            self.dwell[column] = self.data_frame.groupby(column)['duration'].sum()
+        return self.dwell[column]
+
     def plot_most_readed_lines(self, qtd_elements: int = 5, save_plot: bool = False, save_data: bool = False):
-        grouped_data = self.data_frame.groupby('source_file_line')['duration'].sum()
+        grouped_data = self.get_dwell('source_file_line')
         top_tokens = grouped_data.nlargest(qtd_elements)
         if save_data:
             self.most_readed_lines = top_tokens
@@ -86,7 +140,7 @@ class Question:
                 plt.show()
 
     def plot_most_readed_tokens(self, qtd_elements: int = 5, save_plot: bool = False):
-        grouped_data = self.data_frame.groupby('token')['duration'].sum()
+        grouped_data = self.get_dwell('token')
         top_tokens = grouped_data.nlargest(qtd_elements)
         bars = top_tokens.plot(kind='bar')
         plt.title(f"Top {qtd_elements} Most Read Tokens")
@@ -106,9 +160,7 @@ class Question:
     def plot_most_readed_programming_types(self, qtd_elements: int = 5, save_plot: bool = False):
         self.clean_data()
 
-        areas = "our_tokenization/"+self.question_number+"_Code_Snippet.csv"
-
-        df = pd.read_csv(areas)
+        df = get_metadata().get_aoi_map(self.question_number)
 
         merged_data = pd.merge(self.data_frame, df, left_on='source_file_line', right_on='Linha')
 
@@ -158,13 +210,8 @@ class Question:
         if len(self.most_readed_types) != 0:
             return self.most_readed_types
 
-        areas = "our_tokenization/"+self.question_number+"_Code_Snippet.csv"
-
-        df = pd.read_csv(areas)
-        
-        snippet_upper_limit = df['Linha'].max()
-        snippet_lower_limit = df['Linha'].min()
-        
+        df = get_metadata().get_aoi_map(self.question_number)
+        snippet_lower_limit, snippet_upper_limit = get_metadata().get_line_bounds(self.question_number)
 
         merged_data = pd.merge(self.data_frame, df, left_on='source_file_line', right_on='Linha')
 
@@ -184,8 +231,7 @@ class Question:
         self.clean_data()
         ant = 0
         count = 0
-        areas = "our_tokenization/"+self.question_number+"_Code_Snippet.csv"
-        df = pd.read_csv(areas)
+        df = get_metadata().get_aoi_map(self.question_number)
         merged_data = pd.merge(self.data_frame, df, left_on='source_file_line', right_on='Linha')
         result = {}
         for index, row in merged_data.iterrows():
@@ -226,24 +272,15 @@ class Question:
             self.connect()
 
         df = pd.read_sql_query("SELECT * from fixation", self.connection)
-        df = df.sort_values(by='fixation_order_number', ascending=True)
-
+        saccades = extract_saccades(df)
+        overlaps = saccades[saccades['gap'] < 0]
 
         plt.figure(figsize=(10, 10))
-        cont = 0
-        for index, row in df.iterrows():
-            if cont != 0 and row['fixation_start_event_time'] - (ant['fixation_start_event_time'] + ant['duration']*(10**6))  < 0:
-                plt.quiver(ant['source_file_col'], ant['source_file_line'], 
-                       row['source_file_col'] - ant['source_file_col'], 
-                       row['source_file_line'] - ant['source_file_line'], 
-                       angles='xy', scale_units='xy', scale=1, color=color, alpha=alpha)
-            plt.scatter(row['source_file_col'],row['source_file_line'] , s=row['duration'], color='red', alpha=alpha)
-            #plt.text(row['source_file_col'],row['source_file_line'] , row['duration'], color='white', ha='center', va='center')
-            ant = row
-            cont+=1
-            
+        plt.quiver(overlaps['from_col'], overlaps['from_line'],
+                   overlaps['amplitude_cols'], overlaps['amplitude_lines'],
+                   angles='xy', scale_units='xy', scale=1, color=color, alpha=alpha)
+        plt.scatter(df['source_file_col'], df['source_file_line'], s=df['duration'], color='red', alpha=alpha)
 
-        
         #plt.quiver(df['source_file_line'], df['source_file_col'], dx, dy, angles='xy', scale_units='xy', scale=1, color=color,
                    #alpha=alpha)
         plt.title("Sequence of Points")
@@ -251,13 +288,31 @@ class Question:
         plt.ylabel('Y')
         plt.show()
 
+    def get_saccades(self, save_file: bool = False) -> pd.DataFrame:
+        """Returns the saccade table of the cleaned fixations, computing it only once.
+        When the question has a frame_cache the table is not kept, so it doesn't go over the memory limit.
+        If save_file is True the table is saved next to the .db3 as saccades_XX.tsv
+        """
+        self.clean_data()
+        saccades = self.saccades
+        if saccades is None:
+            saccades = extract_saccades(self.data_frame)
+            if self.frame_cache is None:
+                self.saccades = saccades
+
+        if save_file:
+            self.save_saccades(saccades)
+
+        return saccades
+
+    def save_saccades(self, saccades: pd.DataFrame):
+        saccades.to_csv(self.full_path[:-8]+"saccades_"+self.question_number+".tsv", sep='\t', index=False)
+
     def get_variance(self):
         return self.variance
     
     def set_smell(self, q_number):
-        with open('codes\info.json') as f:
-            data = json.load(f)
-            return data[q_number]["smell"]
+        return get_metadata().get_smell(q_number)
 
     def get_density(self):
         data = np.vstack([self.data_frame['source_file_line'], self.data_frame['source_file_col']])
@@ -269,7 +324,7 @@ class Question:
         print(density)
         
 if __name__ == "__main__":
-    q = Question("experimentos\\Experimento 05\\Sem Dejavu\\02\\db02.db3")
+    q = Question(os.path.join("experimentos", "Experimento 05", "Sem Dejavu", "02", "db02.db3"))
     q.clean_data()
     # q.plot_eye_path_fixation()
     # q.generate_tsv_file()
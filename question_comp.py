@@ -8,16 +8,34 @@ import pandas as pd
 import tqdm
 import plotly.express as px
 import plotly.graph_objects as go
-import json
+from ground_truth import GroundTruth
+from metadata import get_metadata
+from saccades import extract_saccades, summarize_saccades
+from frame_cache import FrameCache
+from correctness_stats import compare_groups, select_metric_columns
+from dwell_raster import DwellRaster
+from dwell_cube import DwellCube
+import utilities as ut
 
 class QuestionComparision:
-    def __init__(self, experiments_dir: str) -> None:
-        
+    def __init__(self, experiments_dir: str, max_cache_bytes: int = None, spill_dir: str = None) -> None:
+        """
+        Args:
+            experiments_dir (str): The path to the experiments directory.
+            max_cache_bytes (int, optional): Memory limit for the fixation DataFrames of all questions. When given,
+                the least recently used DataFrames are evicted and reloaded when accessed again. Defaults to no limit.
+            spill_dir (str, optional): Directory where the evicted DataFrames are saved, so they are reloaded
+                from there instead of the .db3 files. Defaults to None.
+        """
         self.experiments_dir = experiments_dir
         self.questions = {}
         self.list_of_fix_vectors = {}
+        self.frame_cache: FrameCache = None
+        self.dwell_cube: DwellCube = None
+        if max_cache_bytes is not None:
+            self.frame_cache = FrameCache(max_cache_bytes, spill_dir)
 
-    def get_questions_for_experiments(self) -> None:
+    def get_questions_for_experiments(self, batch_clean: bool = False) -> None:
         """This functin is very specific for the experiments directory structure.
         It's important to note that the experiments directory must have the following structure:
         experiments_dir
@@ -26,6 +44,10 @@ class QuestionComparision:
                     01
                     02
 
+        Args:
+            batch_clean (bool, optional): Clean all the questions at once with clean_data_batch, instead of
+                one by one when each Question is created. Defaults to False.
+
         Returns:
             dict: A dict composed by the experiments as keys and the questions objects
         """        
@@ -42,7 +64,84 @@ class QuestionComparision:
                                 for java_file in os.listdir(question_path):
                                     java_file_path = os.path.join(question_path, java_file)
                                     if java_file.endswith(".db3"):
-                                        self.questions[experiment].append(Question(java_file_path))
+                                        self.questions[experiment].append(Question(java_file_path, self.frame_cache, not batch_clean))
+
+        if batch_clean:
+            self.clean_data_batch()
+            for experiment in self.questions:
+                for question in self.questions[experiment]:
+                    question.get_most_readed_types()
+
+    def clean_data_batch(self, questions: list[Question] = None) -> None:
+        """
+        Cleans the fixations of many questions at once: the raw fixation tables are concatenated with a
+        session column and the white space removal (without moving durations between sessions), the
+        white space count and the variance are computed in a single grouped pass. The results are
+        split back to each Question, like Question.clean_data would do.
+
+        When there is a memory limit (max_cache_bytes), the sessions are cleaned in chunks whose raw tables
+        use at most half of the limit, the other half is left for the cleaned copy of the chunk.
+
+        Args:
+            questions (list[Question], optional): The questions to clean. Defaults to every question not cleaned yet.
+
+        Returns:
+            None
+        """
+        if questions is None:
+            questions = [question for experiment in self.questions for question in self.questions[experiment]]
+        questions = [question for question in questions if question.total_size is None]
+
+        chunk_limit = None if self.frame_cache is None else self.frame_cache.max_bytes // 2
+        chunk = []
+        frames = []
+        time_stamps = []
+        chunk_bytes = 0
+        for question in questions:
+            if question.connection == None:
+                question.connect()
+            frame = pd.read_sql_query("SELECT * from fixation", question.connection).assign(session=len(chunk))
+            frame_bytes = int(frame.memory_usage(deep=True).sum())
+            if chunk_limit is not None and len(chunk) > 0 and chunk_bytes + frame_bytes > chunk_limit:
+                self._clean_data_chunk(chunk, frames, time_stamps)
+                chunk, frames, time_stamps, chunk_bytes = [], [], [], 0
+                frame['session'] = 0
+            chunk.append(question)
+            frames.append(frame)
+            chunk_bytes += frame_bytes
+            time_stamps.append(pd.read_sql_query("SELECT MIN(CAST(time_stamp AS INTEGER)) AS first, "
+                                                 "MAX(CAST(time_stamp AS INTEGER)) AS last from ide_context",
+                                                 question.connection))
+        if len(chunk) > 0:
+            self._clean_data_chunk(chunk, frames, time_stamps)
+
+    def _clean_data_chunk(self, questions: list[Question], frames: list[pd.DataFrame], time_stamps: list[pd.DataFrame]) -> None:
+        """Cleans the raw fixations of a group of sessions for clean_data_batch, frames[i] belongs to questions[i]."""
+        raw = pd.concat(frames)
+        time_stamps = pd.concat(time_stamps, ignore_index=True)
+
+        sessions = range(len(questions))
+        total_size = raw.groupby('session').size().reindex(sessions, fill_value=0)
+        white_spaces_count = (raw['token'] == "WHITESPACE").groupby(raw['session']).sum().reindex(sessions, fill_value=0)
+        time_to_complete = (time_stamps['last'] - time_stamps['first']) // 1000
+
+        cleaned = ut.redistribute_white_space(raw, "WHITESPACE", session_column='session')
+        clean_sessions = cleaned.groupby('session')
+        variance = clean_sessions['source_file_line'].var() + clean_sessions['source_file_col'].var()
+        frames = {session: group.drop(columns='session') for session, group in clean_sessions}
+
+        for session, question in enumerate(questions):
+            data_frame = frames.get(session, raw.iloc[0:0].drop(columns='session'))
+            question.set_clean_data(data_frame, int(total_size[session]), int(white_spaces_count[session]),
+                                    int(time_to_complete[session]), variance.get(session, np.nan))
+
+    def get_cache_stats(self) -> dict:
+        """
+        Returns the hit/miss statistics of the fixation DataFrames cache, or an empty dict if there is no memory limit.
+        """
+        if self.frame_cache is None:
+            return {}
+        return self.frame_cache.stats()
 
     def generate_tsv_files(self) -> None:
         """
@@ -317,7 +416,7 @@ class QuestionComparision:
         """
         result = {}
 
-        df = pd.read_csv(answer_path)
+        ground_truth = GroundTruth(answer_path)
         color = 'r'
         for experiment in self.questions:
             for question in self.questions[experiment]:
@@ -329,10 +428,7 @@ class QuestionComparision:
 
         for question in result:
             for experiment_question in tqdm.tqdm(result[question]):
-                new_df = df.loc[(df['questao'] == int(experiment_question.question_number))]
-                new_df = new_df.loc[(new_df['Experimento'] == int(experiment_question.experiment_number))]['acerto'].values
-
-                if new_df[0]:
+                if ground_truth.is_correct(experiment_question.experiment_number, experiment_question.question_number):
                     color = 'g'
                 else:
                     color = 'r'
@@ -342,6 +438,49 @@ class QuestionComparision:
             plt.savefig(f'error_x_success{experiment_question.question_number}.png',dpi=400)
             plt.clf()
 
+    def plot_dwell_difference_heatmaps(self, answer_path: str = 'respostas.csv', save_plot: bool = True, use_sparse: bool = False) -> None:
+        """
+        Plots, for each question, a heatmap of the mean dwell of the participants that answered correctly minus the
+        mean dwell of the ones that answered incorrectly, in (line, col) cells. Participants without an answer
+        in the answer file are not used.
+
+        Args:
+            answer_path (str): The path to the answer file (default is 'respostas.csv').
+            save_plot (bool): Save each plot as 'dwell_difference{question}.png' instead of showing it. Defaults to True.
+            use_sparse (bool): Store the grids as sparse matrices. Defaults to False.
+
+        Returns:
+            None
+        """
+        result = {}
+
+        ground_truth = GroundTruth(answer_path)
+        for experiment in self.questions:
+            for question in self.questions[experiment]:
+                if question.question_number != "01":
+                    if question.question_number in result:
+                        result[question.question_number].append(question)
+                    else:
+                        result[question.question_number] = [question]
+
+        for question in result:
+            frames = []
+            correct = []
+            for experiment_question in result[question]:
+                # participants without an answer are left out instead of counted as incorrect
+                answer = ground_truth.get(experiment_question.experiment_number, question).get('correct')
+                if answer is None or pd.isna(answer):
+                    continue
+                experiment_question.clean_data()
+                frames.append(experiment_question.data_frame)
+                correct.append(bool(answer))
+
+            if len(frames) == 0:
+                continue
+            raster = DwellRaster(frames, use_sparse)
+            path = f'dwell_difference{question}.png' if save_plot else None
+            raster.plot_difference(correct, f"Dwell difference correct - incorrect, question {question}", path)
+
     def get_colors(self, smell, severity) -> tuple[int]:
         """
         Get the normalized RGB color based on the given smell and severity.
@@ -389,13 +528,11 @@ class QuestionComparision:
         }
         """
         result = []
-        with open(path) as f:
-            data = json.load(f)
+        metadata = get_metadata(info_path=path)
 
         for key in order:
             key = key.split("_")[1]
-            info = data[key]
-            color = self.get_colors(info["smell"], info["severity"])
+            color = self.get_colors(metadata.get_smell(key), metadata.get_severity(key))
             result.append(color)
         print(len(result))
 
@@ -493,7 +630,7 @@ class QuestionComparision:
         """
         result = {}
 
-        df = pd.read_csv(answer_path)
+        ground_truth = GroundTruth(answer_path)
         color = 'r'
         for experiment in self.questions:
             for question in self.questions[experiment]:
@@ -506,10 +643,7 @@ class QuestionComparision:
         for question in result:
             fig = go.Figure()
             for experiment_question in tqdm.tqdm(result[question]):
-                new_df = df.loc[(df['questao'] == int(experiment_question.question_number))]
-                new_df = new_df.loc[(new_df['Experimento'] == int(experiment_question.experiment_number))]
-
-                acerto = new_df['acerto'].values
+                correct = ground_truth.is_correct(experiment_question.experiment_number, experiment_question.question_number)
 
                 source_file_col = experiment_question.data_frame['source_file_col'].values
                 source_file_line = experiment_question.data_frame['source_file_line'].values
@@ -517,9 +651,9 @@ class QuestionComparision:
                 syntactic_category = experiment_question.data_frame['syntactic_category'].values
                 duration = experiment_question.data_frame['duration'].values
 
-                text = "Token: " + token + "<br>Syntactic Category: " + syntactic_category + "<br>Duration: " + duration.astype(str) + "<br>Correct: " + acerto.astype(str) + "<extra></extra>"
+                text = "Token: " + token + "<br>Syntactic Category: " + syntactic_category + "<br>Duration: " + duration.astype(str) + "<br>Correct: " + str(correct) + "<extra></extra>"
 
-                if acerto[0]:
+                if correct:
                     color = 'rgb(0,255,0)'
                 else:
                     color = 'rgb(255,0,0)'
@@ -533,20 +667,149 @@ class QuestionComparision:
             fig.write_html(f'error_x_success{experiment_question.question_number}.html', full_html=True, include_plotlyjs='cdn')
             fig.show()
 
-    def get_most_readed_lines_for_all_participants(self, experiment: int = 5):
+    def get_dwell_cube(self) -> DwellCube:
+        """
+        Returns the dwell cube of all the questions of all the experiments, building it on the first call.
+        The cube answers the top-N, per participant and pooled queries of lines, tokens and AOIs without
+        grouping the fixations again, see dwell_cube.DwellCube.
+        """
+        if self.dwell_cube is None:
+            self.dwell_cube = DwellCube.from_questions([question for experiment in self.questions
+                                                        for question in self.questions[experiment]])
+        return self.dwell_cube
 
-        df = pd.DataFrame()
-        for key in self.questions:
-            for index, question in enumerate(self.questions[key]):
-                if index == experiment:
-                    question.clean_data()
-                    question.plot_most_readed_lines(5, save_data=True)
-                    df = pd.concat([df, question.most_readed_lines], axis=0)
-        
+    def get_most_readed_lines_for_all_participants(self, question_number: int = 6, qtd_elements: int = 5):
+        """
+        Plots the sum of the top qtd_elements most read lines of each participant in a question.
+
+        Args:
+            question_number (int): The number of the question. Defaults to 6.
+            qtd_elements (int): Number of lines of each participant. Defaults to 5.
+        """
+        if question_number < 10:
+            question_number = "0" + str(question_number)
+        else:
+            question_number = str(question_number)
+
+        top_lines = self.get_dwell_cube().top_per_participant(question_number, qtd_elements)
+
+        df = top_lines.groupby(level='line').sum().to_frame()
         df.index.name = 'Grupo'
-        df.groupby('Grupo').sum().plot(kind='bar')
+        df.plot(kind='bar')
         plt.show()
 
+    def get_saccades_for_all_participants(self, question_number: int = None, save_files: bool = False) -> pd.DataFrame:
+        """
+        Builds the saccade table of every participant in a single vectorized pass and stores
+        the part of each participant in question.saccades. When there is a memory limit (max_cache_bytes)
+        the parts are not stored, only returned.
+
+        Args:
+            question_number (int, optional): Only use this question. Defaults to all questions.
+            save_files (bool, optional): Save each table next to its .db3 as saccades_XX.tsv. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The saccade table with the 'experiment' and 'question' columns.
+        """
+        if question_number is not None:
+            question_number = "0" + str(question_number) if question_number < 10 else str(question_number)
+
+        questions = []
+        frames = []
+        for experiment in self.questions:
+            for question in self.questions[experiment]:
+                if question_number is not None and question.question_number != question_number:
+                    continue
+                question.clean_data()
+                frames.append(question.data_frame.assign(session=len(questions)))
+                questions.append(question)
+
+        if len(frames) == 0:
+            return pd.DataFrame()
+
+        saccades = extract_saccades(pd.concat(frames, ignore_index=True), session_column='session')
+
+        if self.frame_cache is None or save_files:
+            for session, group in saccades.groupby('session', sort=False):
+                question = questions[session]
+                question_saccades = group.drop(columns='session').reset_index(drop=True)
+                if self.frame_cache is None:
+                    question.saccades = question_saccades
+                if save_files:
+                    question.save_saccades(question_saccades)
+
+        sessions = pd.DataFrame({'experiment': [q.experiment_number for q in questions],
+                                 'question': [q.question_number for q in questions]})
+        saccades = pd.concat([sessions.loc[saccades['session']].reset_index(drop=True),
+                              saccades.drop(columns='session')], axis=1)
+        return saccades
+
+    def get_saccade_statistics(self, question_number: int = None) -> pd.DataFrame:
+        """
+        Returns the saccade statistics (count, amplitudes, gap and regressions) of each participant and question.
+        """
+        saccades = self.get_saccades_for_all_participants(question_number)
+        return summarize_saccades(saccades, ['experiment', 'question'])
+
+    def get_metrics_table(self) -> pd.DataFrame:
+        """
+        Builds a table with one row per participant and question (except question 01) with the metrics
+        used in the correctness analyses: time_to_complete, regression_count and one 'dwell_<AOI type>'
+        column per AOI type (0 when the participant didn't read an AOI type of the snippet).
+
+        Returns:
+            pd.DataFrame: The metrics table with the 'experiment' and 'question' columns.
+        """
+        saccade_columns = ['fixation_order_number', 'source_file_line', 'source_file_col', 'x', 'y',
+                           'fixation_start_event_time', 'duration']
+        rows = []
+        frames = []
+        for experiment in self.questions:
+            for question in self.questions[experiment]:
+                if question.question_number == "01":
+                    continue
+                question.clean_data()
+                frames.append(question.data_frame[saccade_columns].assign(session=len(rows)))
+                row = {'experiment': question.experiment_number,
+                       'question': question.question_number,
+                       'time_to_complete': question.time_to_complete}
+                for key in question.most_readed_types:
+                    row['dwell_' + key] = question.most_readed_types[key]
+                rows.append(row)
+
+        if len(rows) == 0:
+            return pd.DataFrame()
+
+        metrics = pd.DataFrame(rows)
+        dwell_columns = [c for c in metrics.columns if c.startswith('dwell_')]
+        present = metrics.groupby('question')[dwell_columns].transform('count') > 0
+        metrics[dwell_columns] = metrics[dwell_columns].mask(present & metrics[dwell_columns].isna(), 0)
+
+        # the saccades are only counted here, they aren't stored in the questions
+        saccades = extract_saccades(pd.concat(frames, ignore_index=True), session_column='session')
+        regressions = saccades.groupby('session')['regression'].sum()
+        # sessions with less than 2 fixations have no saccades
+        metrics['regression_count'] = regressions.reindex(range(len(rows)), fill_value=0).to_numpy()
+        return metrics
+
+    def compare_correct_and_incorrect(self, answer_path: str = 'respostas.csv', n_resamples: int = 10000,
+                                      n_jobs: int = None, seed: int = None) -> pd.DataFrame:
+        """
+        Compares the metrics of get_metrics_table between the participants that answered each question
+        correctly and incorrectly, with permutation tests and bootstrap confidence intervals.
+
+        Args:
+            answer_path (str): The path to the answer file (default is 'respostas.csv').
+            n_resamples (int, optional): Number of permutations and bootstrap resamples. Defaults to 10000.
+            n_jobs (int, optional): Number of processes used to split the questions. Defaults to no pool.
+            seed (int, optional): Seed for reproducible results. Defaults to None.
+
+        Returns:
+            pd.DataFrame: One row per question and metric, see correctness_stats.compare_groups.
+        """
+        metrics = select_metric_columns(GroundTruth(answer_path).join(self.get_metrics_table()))
+        return compare_groups(metrics, n_resamples=n_resamples, n_jobs=n_jobs, seed=seed)
+
 if __name__ == "__main__":
     experiments_dir = "C:/Users/Pedro/OneDrive/Área de Trabalho/dataAnal/experimentos"
     qc = QuestionComparision(experiments_dir)
@@ -560,7 +823,7 @@ if __name__ == "__main__":
     # qc.plot_mean_of_most_readed_tokens()
     # qc.plot_question_time_comparison_for_one_experiment(5)
     # qc.plot_scatter_error_and_success()
-    qc.boxplot_of_time_questions('codes/info.json')
+    qc.boxplot_of_time_questions(os.path.join('codes', 'info.json'))
     # qc.generate_csv_for_top3_most_read_tokens()
     # qc.plot_intereative_scatter()
     # qc.get_most_readed_lines_for_all_participants()
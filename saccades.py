@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+SACCADE_COLUMNS = ['fixation_order_number', 'next_fixation_order_number',
+                   'from_line', 'from_col', 'to_line', 'to_col',
+                   'amplitude_lines', 'amplitude_cols', 'amplitude_pixels',
+                   'gap', 'direction', 'regression']
+
+
+def extract_saccades(df: pd.DataFrame, session_column: str = None) -> pd.DataFrame:
+    """Builds the saccade table of a fixation table, in a single vectorized pass.
+
+    Each row is the movement between one fixation and the next one (by fixation_order_number):
+        amplitude_lines / amplitude_cols: the signed distance in lines and columns of the code
+        amplitude_pixels: the euclidean distance in pixels (x, y)
+        gap: the time between the end of the fixation and the start of the next one, in the same unit of
+        fixation_start_event_time (the duration is converted with duration*10**6). A negative gap means the
+        fixations overlap
+        direction: the angle of the movement in degrees, 0 is to the right and 90 is down the screen
+        regression: True if the movement goes back in the reading order (previous line, or same line and previous column)
+
+    Args:
+        df (pd.DataFrame): The fixation table, with the columns of the iTrace fixation table.
+        session_column (str, optional): A column that identifies the session of each fixation. When given,
+            the table of many sessions is processed at once and no saccade crosses two sessions.
+
+    Returns:
+        pd.DataFrame: The saccade table, with the session column first when it is given.
+    """
+    sort_columns = ['fixation_order_number'] if session_column is None else [session_column, 'fixation_order_number']
+    df = df.sort_values(by=sort_columns)
+
+    if session_column is None:
+        nxt = df.shift(-1)
+        valid = np.ones(len(df), dtype=bool)
+        valid[-1:] = False
+    else:
+        nxt = df.groupby(session_column, sort=False).shift(-1)
+        valid = nxt['fixation_order_number'].notna().to_numpy()
+
+    line = df['source_file_line'].to_numpy(dtype=float)
+    col = df['source_file_col'].to_numpy(dtype=float)
+    next_line = nxt['source_file_line'].to_numpy(dtype=float)
+    next_col = nxt['source_file_col'].to_numpy(dtype=float)
+    dx = nxt['x'].to_numpy(dtype=float) - df['x'].to_numpy(dtype=float)
+    dy = nxt['y'].to_numpy(dtype=float) - df['y'].to_numpy(dtype=float)
+    d_line = next_line - line
+    d_col = next_col - col
+
+    result = pd.DataFrame({
+        'fixation_order_number': df['fixation_order_number'].to_numpy(),
+        'next_fixation_order_number': nxt['fixation_order_number'].to_numpy(),
+        'from_line': line,
+        'from_col': col,
+        'to_line': next_line,
+        'to_col': next_col,
+        'amplitude_lines': d_line,
+        'amplitude_cols': d_col,
+        'amplitude_pixels': np.hypot(dx, dy),
+        'gap': nxt['fixation_start_event_time'].to_numpy(dtype=float)
+               - (df['fixation_start_event_time'].to_numpy(dtype=float) + df['duration'].to_numpy(dtype=float) * (10**6)),
+        'direction': np.degrees(np.arctan2(dy, dx)),
+        'regression': (d_line < 0) | ((d_line == 0) & (d_col < 0)),
+    })
+    if session_column is not None:
+        result.insert(0, session_column, df[session_column].to_numpy())
+
+    result = result[valid].reset_index(drop=True)
+    result['next_fixation_order_number'] = result['next_fixation_order_number'].astype(df['fixation_order_number'].dtype)
+    return result
+
+
+def summarize_saccades(saccades: pd.DataFrame, group_columns: list[str]) -> pd.DataFrame:
+    """Aggregates a saccade table by the given columns (e.g. ['experiment', 'question']).
+
+    Returns:
+        pd.DataFrame: The count, mean amplitudes, mean gap and regression count and rate of each group.
+    """
+    return saccades.groupby(group_columns).agg(
+        saccade_count=('amplitude_pixels', 'size'),
+        mean_amplitude_lines=('amplitude_lines', lambda s: s.abs().mean()),
+        mean_amplitude_cols=('amplitude_cols', lambda s: s.abs().mean()),
+        mean_amplitude_pixels=('amplitude_pixels', 'mean'),
+        mean_gap=('gap', 'mean'),
+        regression_count=('regression', 'sum'),
+        regression_rate=('regression', 'mean'),
+    )
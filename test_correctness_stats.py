@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from correctness_stats import compare_groups
+
+
+def test_missing_values_are_left_out_of_the_metric():
+    metrics = pd.DataFrame({
+        'question': ['02'] * 6,
+        'correct': [True, True, True, False, False, False],
+        'with_nan': [1.0, 2.0, np.nan, 1.0, 2.0, 3.0],
+        'complete': [1.0, 2.0, 3.0, 1.0, 2.0, 3.0],
+    })
+    result = compare_groups(metrics, n_resamples=999, seed=0).set_index('metric')
+
+    with_nan = result.loc['with_nan']
+    assert with_nan['n_correct'] == 2
+    assert with_nan['mean_correct'] == 1.5
+    assert with_nan['p_value'] > 0.5
+    assert not np.isnan(with_nan['ci_low'])
+
+    complete = result.loc['complete']
+    assert complete['n_correct'] == 3
+    assert complete['p_value'] == 1.0
+
+
+def test_metric_with_only_one_group_has_no_p_value():
+    metrics = pd.DataFrame({
+        'question': ['02'] * 4,
+        'correct': [True, True, False, False],
+        'metric': [1.0, 2.0, np.nan, np.nan],
+    })
+    result = compare_groups(metrics, n_resamples=99, seed=0)
+    assert np.isnan(result.loc[0, 'p_value'])
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import os
 
 def found_white_space(df: pd.DataFrame, white_name: any, column_name: str, percentege_or_count: bool = True):
@@ -22,6 +23,11 @@ def get_files_full_path(path):
 
     return files_tot
 
+def split_path(path: str) -> list[str]:
+    ''' split a path in its parts, accepting both '/' and '\\' as separators
+    '''
+    return [part for part in path.replace("\\", "/").split("/") if part]
+
 def remove_white_space_by_proximity(df: pd.DataFrame):
     all_white_spaces_positions = []
     for index, val in df.iterrows():
@@ -43,4 +49,51 @@ def remove_white_space_by_proximity(df: pd.DataFrame):
                     df.at[index - 1,"duration"] = df.at[index - 1,"duration"] + val["duration"]
             all_white_spaces_positions.append(index)
 
-    df.drop(all_white_spaces_positions, axis=0, inplace = True)
\ No newline at end of file
+    df.drop(all_white_spaces_positions, axis=0, inplace = True)
+
+def redistribute_white_space(df: pd.DataFrame, white_name: any = "WHITESPACE", session_column: str = None) -> pd.DataFrame:
+    ''' vectorized version of remove_white_space_by_proximity, returns a new df without the white spaces.
+    each white space gives its duration to the closest neighbour (the next one for the first row and the previous
+    one for the last row), when the neighbour is also a white space the duration is lost, as in the loop version.
+    if session_column is given, the first and last rows are the ones of each session, so no duration crosses sessions
+    '''
+    n = len(df)
+    if n == 0:
+        return df.copy()
+
+    white = (df["token"] == white_name).to_numpy()
+    line = df["source_file_line"].to_numpy(dtype=float)
+    col = df["source_file_col"].to_numpy(dtype=float)
+    duration = df["duration"].to_numpy()
+
+    first = np.zeros(n, dtype=bool)
+    last = np.zeros(n, dtype=bool)
+    if session_column is None:
+        first[0] = True
+        last[-1] = True
+    else:
+        session = df[session_column].to_numpy()
+        first[0] = True
+        first[1:] = session[1:] != session[:-1]
+        last[:-1] = first[1:]
+        last[-1] = True
+
+    upper_distance = np.full(n, np.nan)
+    lower_distance = np.full(n, np.nan)
+    upper_distance[:-1] = line[1:] - line[:-1] + col[1:] - col[:-1]
+    lower_distance[1:] = line[:-1] - line[1:] + col[:-1] - col[1:]
+
+    forward = white & ~last & (first | (lower_distance > upper_distance))
+    backward = white & ~forward & ~first
+
+    target = np.full(n, -1)
+    positions = np.arange(n)
+    target[forward] = positions[forward] + 1
+    target[backward] = positions[backward] - 1
+    valid = target >= 0
+    valid[valid] = ~white[target[valid]]
+
+    added = np.bincount(target[valid], weights=duration[valid].astype(float), minlength=n)
+    result = df[~white].copy()
+    result["duration"] = (duration + added)[~white].astype(duration.dtype)
+    return result